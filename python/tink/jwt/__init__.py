@@ -47,7 +47,7 @@ def new_raw_jwt(*,
                 type_header: Optional[Text] = None,
                 issuer: Optional[Text] = None,
                 subject: Optional[Text] = None,
-                audiences: Optional[List[Text]] = None,
+                audiences: Optional[Union[Text, List[Text]]] = None,
                 jwt_id: Optional[Text] = None,
                 expiration: Optional[datetime.datetime] = None,
                 without_expiration: bool = False,
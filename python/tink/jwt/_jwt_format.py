@@ -16,12 +16,25 @@
 import base64
 import binascii
 import json
+import math
 import struct
 from typing import Any, Optional, Text, Tuple
 
 from tink.proto import tink_pb2
 from tink.jwt import _jwt_error
 
+try:
+  # orjson is an optional dependency. If it is installed, it is used to encode
+  # and decode JSON, because it is much faster than the json module.
+  import orjson  # pylint: disable=g-import-not-at-top
+except ImportError:
+  orjson = None
+
+# orjson decodes integers outside of the 64 bit range as floats, which changes
+# their value. If orjson returns a float at least this large, the JSON text is
+# decoded again with json.
+_MIN_LARGE_FLOAT = float(2**63)
+
 _VALID_ALGORITHMS = frozenset({
     'HS256', 'HS384', 'HS512', 'ES256', 'ES384', 'ES512', 'RS256', 'RS384',
     'RS384', 'RS512', 'PS256', 'PS384', 'PS512'
@@ -62,27 +75,84 @@ def _base64_decode(encoded_data: bytes) -> bytes:
 
 
 def json_dumps(json_data: Any) -> Text:
-  return json.dumps(json_data, separators=(',', ':'))
+  """Encodes json_data as a compact JSON string.
+
+  json_data must not contain NaN or infinite floats, because orjson encodes
+  them as null.
+
+  The exact output depends on whether orjson is installed: orjson writes
+  non-ASCII characters as UTF-8 and 1e16 as "1e16", while json escapes them
+  (e.g. "\\u00fc") and writes "1e+16". Both decode to the same value, but the
+  encoded headers and payloads, and so the tokens, are not byte-identical.
+  """
+  if orjson is not None:
+    try:
+      return orjson.dumps(json_data).decode('utf8')
+    except orjson.JSONEncodeError:
+      # orjson does not support integers outside of the 64 bit range, deeply
+      # nested values or invalid strings. json does, so we fall back to it.
+      pass
+  try:
+    return json.dumps(json_data, separators=(',', ':'), allow_nan=False)
+  except ValueError:
+    raise _jwt_error.JwtInvalidError('Failed to encode JSON string')
+  except RecursionError:
+    raise _jwt_error.JwtInvalidError(
+        'Failed to encode JSON string, too many recursions')
 
 
-def validate_all_strings(json_data: Any):
-  """Recursivly visits all strings and raises UnicodeEncodeError if invalid."""
+def _reject_constant(constant: Text) -> None:
+  # orjson does not accept NaN, Infinity and -Infinity, and they are not valid
+  # JSON either.
+  raise _jwt_error.JwtInvalidError('invalid JSON constant %s' % constant)
+
+
+def _parse_float(value: Text) -> float:
+  # Numbers like 1e400 overflow to infinity. orjson rejects them, so we do too.
+  result = float(value)
+  if not math.isfinite(result):
+    raise _jwt_error.JwtInvalidError('number %s is out of range' % value)
+  return result
+
+
+def validate_all_strings(json_data: Any) -> bool:
+  """Recursivly visits all strings and raises UnicodeEncodeError if invalid.
+
+  Args:
+    json_data: the decoded JSON value.
+
+  Returns:
+    True if json_data contains a float with an absolute value of at least 2**63.
+  """
   if isinstance(json_data, str):
     # We use encode('utf8') to validate that the string is valid.
     json_data.encode('utf8')
+    return False
+  if isinstance(json_data, float):
+    return abs(json_data) >= _MIN_LARGE_FLOAT
+  has_large_float = False
   if isinstance(json_data, list):
     for item in json_data:
-      validate_all_strings(item)
+      if validate_all_strings(item):
+        has_large_float = True
   if isinstance(json_data, dict):
     for key, value in json_data.items():
       key.encode('utf8')
-      validate_all_strings(value)
+      if validate_all_strings(value):
+        has_large_float = True
+  return has_large_float
 
 
 def json_loads(json_text: Text) -> Any:
   """Does the same as json.loads, but with some additinal validation."""
   try:
-    json_data = json.loads(json_text)
+    if orjson is not None:
+      # orjson.JSONDecodeError is a subclass of json.decoder.JSONDecodeError.
+      json_data = orjson.loads(json_text)
+      if not validate_all_strings(json_data):
+        return json_data
+    json_data = json.loads(
+        json_text, parse_float=_parse_float, parse_constant=_reject_constant)
     validate_all_strings(json_data)
     return json_data
   except json.decoder.JSONDecodeError:
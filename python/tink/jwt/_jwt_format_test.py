@@ -15,13 +15,27 @@
 
 from absl.testing import absltest
 from absl.testing import parameterized
+from absl.testing.absltest import mock
 from tink.proto import tink_pb2
 from tink.jwt import _jwt_error
 from tink.jwt import _jwt_format
 
 
+# Runs a test once with orjson and once with the json module.
+JSON_BACKENDS = parameterized.named_parameters(('orjson', True),
+                                               ('json', False))
+
+
 class JwtFormatTest(parameterized.TestCase):
 
+  def _json_backend(self, use_orjson):
+    """Returns a context manager that makes _jwt_format use one backend."""
+    if not use_orjson:
+      return mock.patch.object(_jwt_format, 'orjson', None)
+    if _jwt_format.orjson is None:
+      self.skipTest('orjson is not installed')
+    return mock.patch.object(_jwt_format, 'orjson', _jwt_format.orjson)
+
   def test_base64_encode_decode_header_fixed_data(self):
     # Example from https://tools.ietf.org/html/rfc7519#section-3.1
     header = bytes([
@@ -67,19 +81,93 @@ class JwtFormatTest(parameterized.TestCase):
     with self.assertRaises(_jwt_error.JwtInvalidError):
       _jwt_format._base64_decode(b'{')
 
-  def test_json_loads_recursion(self):
+  @JSON_BACKENDS
+  def test_json_dumps_is_compact(self, use_orjson):
+    with self._json_backend(use_orjson):
+      self.assertEqual(
+          _jwt_format.json_dumps({'a': [1, 2.5, None, True], 'b': {'c': 'd'}}),
+          '{"a":[1,2.5,null,true],"b":{"c":"d"}}')
+
+  @JSON_BACKENDS
+  def test_json_dumps_loads_non_ascii(self, use_orjson):
+    json_data = {'iss': u'\U0001d11e', u'näme': u'ü'}
+    with self._json_backend(use_orjson):
+      self.assertEqual(
+          _jwt_format.json_loads(_jwt_format.json_dumps(json_data)), json_data)
+
+  def test_json_dumps_output_depends_on_backend(self):
+    json_data = {'iss': u'ü', 'a': 1e16}
+    with self._json_backend(False):
+      self.assertEqual(
+          _jwt_format.json_dumps(json_data), '{"iss":"\\u00fc","a":1e+16}')
+    with self._json_backend(True):
+      self.assertEqual(
+          _jwt_format.json_dumps(json_data), u'{"iss":"ü","a":1e16}')
+
+  @JSON_BACKENDS
+  def test_json_loads_keeps_large_integers(self, use_orjson):
+    with self._json_backend(use_orjson):
+      json_data = _jwt_format.json_loads(
+          '{"a":18446744073709551616,"b":-9223372036854775809,"c":1e30}')
+    self.assertEqual(json_data['a'], 2**64)
+    self.assertIsInstance(json_data['a'], int)
+    self.assertEqual(json_data['b'], -2**63 - 1)
+    self.assertIsInstance(json_data['b'], int)
+    self.assertEqual(json_data['c'], 1e30)
+
+  @JSON_BACKENDS
+  def test_json_loads_long_string_of_digits(self, use_orjson):
+    with self._json_backend(use_orjson):
+      json_data = _jwt_format.json_loads(
+          '{"jti":"1234567890123456789","a":9223372036854775807}')
+    self.assertEqual(json_data['jti'], '1234567890123456789')
+    self.assertEqual(json_data['a'], 2**63 - 1)
+
+  @JSON_BACKENDS
+  def test_json_dumps_large_integers(self, use_orjson):
+    with self._json_backend(use_orjson):
+      self.assertEqual(
+          _jwt_format.json_dumps({'a': 2**64}), '{"a":18446744073709551616}')
+
+  def test_json_dumps_non_finite_numbers_fails_with_json(self):
+    # orjson encodes them as null, so callers must reject them before.
+    with mock.patch.object(_jwt_format, 'orjson', None):
+      with self.assertRaises(_jwt_error.JwtInvalidError):
+        _jwt_format.json_dumps({'a': float('nan')})
+
+  @JSON_BACKENDS
+  def test_json_loads_non_finite_numbers_fails(self, use_orjson):
+    with self._json_backend(use_orjson):
+      for json_text in ('{"a":NaN}', '{"a":Infinity}', '{"a":-Infinity}',
+                        '{"a":1e400}', '{"a":-1e400}'):
+        with self.assertRaises(_jwt_error.JwtInvalidError):
+          _jwt_format.json_loads(json_text)
+
+  @JSON_BACKENDS
+  def test_json_dumps_loads_deeply_nested(self, use_orjson):
+    depth = 300
+    json_text = ('{"a":' * depth) + '""' + ('}' * depth)
+    with self._json_backend(use_orjson):
+      self.assertEqual(
+          _jwt_format.json_dumps(_jwt_format.json_loads(json_text)), json_text)
+
+  @JSON_BACKENDS
+  def test_json_loads_recursion(self, use_orjson):
     num_recursions = 1000
     recursive_json = ('{"a":' * num_recursions) + '""' + ('}' * num_recursions)
-    with self.assertRaises(_jwt_error.JwtInvalidError):
-      _jwt_format.json_loads(recursive_json)
-
-  def test_json_loads_with_invalid_utf16(self):
-    with self.assertRaises(_jwt_error.JwtInvalidError):
-      _jwt_format.json_loads(u'{"a":{"b":{"c":"\\uD834"}}}')
-    with self.assertRaises(_jwt_error.JwtInvalidError):
-      _jwt_format.json_loads(u'{"\\uD834":"b"}')
-    with self.assertRaises(_jwt_error.JwtInvalidError):
-      _jwt_format.json_loads(u'{"a":["a":{"b":["c","\\uD834"]}]}')
+    with self._json_backend(use_orjson):
+      with self.assertRaises(_jwt_error.JwtInvalidError):
+        _jwt_format.json_loads(recursive_json)
+
+  @JSON_BACKENDS
+  def test_json_loads_with_invalid_utf16(self, use_orjson):
+    with self._json_backend(use_orjson):
+      with self.assertRaises(_jwt_error.JwtInvalidError):
+        _jwt_format.json_loads(u'{"a":{"b":{"c":"\\uD834"}}}')
+      with self.assertRaises(_jwt_error.JwtInvalidError):
+        _jwt_format.json_loads(u'{"\\uD834":"b"}')
+      with self.assertRaises(_jwt_error.JwtInvalidError):
+        _jwt_format.json_loads(u'{"a":["a":{"b":["c","\\uD834"]}]}')
 
   def test_decode_encode_header_hs256(self):
     # Example from https://tools.ietf.org/html/rfc7515#appendix-A.1
@@ -12,11 +12,11 @@
 # See the License for the specific language governing permissions and
 """The raw JSON Web Token (JWT)."""
 
-import copy
 import datetime
-import json
+import math
 
-from typing import cast, Mapping, Set, List, Dict, Optional, Text, Union, Any
+from typing import (cast, Mapping, Set, List, Dict, Optional, Text, Tuple,
+                    Union, Any)
 
 from tink import core
 from tink.jwt import _jwt_error
@@ -30,15 +30,79 @@ Claim = Union[None, bool, int, float, Text, List[Any], Dict[Text, Any]]
 
 
 def _from_datetime(t: datetime.datetime) -> int:
-  if not t.tzinfo:
+  # A tzinfo whose utcoffset() returns None still makes t a naive datetime.
+  if t.utcoffset() is None:
     raise _jwt_error.JwtInvalidError('datetime must have tzinfo')
-  return int(t.timestamp())
+  timestamp = int(t.timestamp())
+  if timestamp > _MAX_TIMESTAMP_VALUE or timestamp < 0:
+    raise _jwt_error.JwtInvalidError('timestamp is out of range')
+  return timestamp
+
+
+def _to_text(value: Text) -> Text:
+  if not isinstance(value, Text):
+    raise _jwt_error.JwtInvalidError('issuer, subject and jwt_id must be Text')
+  return value
+
+
+def _to_audiences(audiences: Union[Text, List[Text]]) -> List[Text]:
+  # Unlike RawJwt._validate_audience_claim, this uses isinstance, because the
+  # audiences come from the caller and may be subclasses of str.
+  if isinstance(audiences, Text):
+    return [audiences]
+  if not isinstance(audiences, list):
+    raise _jwt_error.JwtInvalidError('audiences must be a Text or a list')
+  copied = list(audiences)
+  if not copied:
+    raise _jwt_error.JwtInvalidError('audiences must be a non-empty list')
+  for value in copied:
+    if not isinstance(value, Text):
+      raise _jwt_error.JwtInvalidError('audiences must only contain Text')
+  return copied
 
 
 def _to_datetime(timestamp: float) -> datetime.datetime:
   return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
 
 
+def _copy_and_validate_claim(value: Any) -> Claim:
+  """Returns a deep copy of value, checking that it only contains JSON types."""
+  if value is None or isinstance(value, (bool, int, Text)):
+    return value
+  if isinstance(value, float):
+    if not math.isfinite(value):
+      raise _jwt_error.JwtInvalidError('NaN and Infinity are not allowed')
+    return value
+  if isinstance(value, list):
+    # A list comprehension would add a second frame per nesting level.
+    copied_list = []
+    for item in value:
+      copied_list.append(_copy_and_validate_claim(item))
+    return copied_list
+  if isinstance(value, dict):
+    copied = {}
+    for key, item in value.items():
+      if not isinstance(key, Text):
+        raise _jwt_error.JwtInvalidError('object keys must be Text')
+      copied[key] = _copy_and_validate_claim(item)
+    return copied
+  raise _jwt_error.JwtInvalidError('unknown type %s' % type(value).__name__)
+
+
+def _split_payload(payload: Any) -> Tuple[Dict[Text, Any], Dict[Text, Any]]:
+  """Splits payload into the registered claims and the custom claims."""
+  if not isinstance(payload, Dict):
+    raise _jwt_error.JwtInvalidError('payload must be a dict')
+  registered = {}
+  custom = {}
+  for name, value in payload.items():
+    if name in _REGISTERED_NAMES:
+      registered[name] = value
+    else:
+      custom[name] = value
+  return registered, custom
+
+
 def _validate_custom_claim_name(name: Text) -> None:
   if name in _REGISTERED_NAMES:
     raise _jwt_error.JwtInvalidError(
@@ -52,49 +116,68 @@ class RawJwt(object):
   that has not yet been verified.
   """
 
+  __slots__ = ('_type_header', '_registered', '_custom', '_json_payload')
+
   def __new__(cls):
     raise core.TinkError('RawJwt cannot be instantiated directly.')
 
-  def __init__(self, type_header: Optional[Text], payload: Dict[Text,
-                                                                Any]) -> None:
-    # No need to copy payload, because only create and from_json_payload
-    # call this method.
-    if not isinstance(payload, Dict):
-      raise _jwt_error.JwtInvalidError('payload must be a dict')
+  def __init__(self,
+               type_header: Optional[Text],
+               registered: Dict[Text, Any],
+               custom: Dict[Text, Any],
+               validate: bool = True) -> None:
+    # No need to copy the claims, because only create and from_json call this
+    # method. create already validates its arguments while building the
+    # claims, so it sets validate to False.
+    # The registered and the custom claims are kept in separate dicts, so that
+    # custom_claim_names doesn't need to filter out the registered names.
     self._type_header = type_header
-    self._payload = payload
-    self._validate_string_claim('iss')
-    self._validate_string_claim('sub')
-    self._validate_string_claim('jti')
-    self._validate_timestamp_claim('exp')
-    self._validate_timestamp_claim('nbf')
-    self._validate_timestamp_claim('iat')
-    self._validate_audience_claim()
+    self._registered = registered
+    self._custom = custom
+    # The claims are never modified after construction, so they only need to
+    # be encoded once. json_payload sets this lazily.
+    self._json_payload = None  # type: Optional[Text]
+    if validate:
+      for name in ('iss', 'sub', 'jti'):
+        self._validate_string_claim(name)
+      for name in ('exp', 'nbf', 'iat'):
+        self._validate_timestamp_claim(name)
+      self._validate_audience_claim()
+
+  # The validators below compare types with "is" instead of using isinstance.
+  # This is faster, and values decoded from JSON are never subclasses. It also
+  # makes sure that bool values are not accepted as timestamps.
+  # pylint: disable=unidiomatic-typecheck
 
   def _validate_string_claim(self, name: Text):
-    if name in self._payload:
-      if not isinstance(self._payload[name], Text):
+    if name in self._registered:
+      if type(self._registered[name]) is not str:
         raise _jwt_error.JwtInvalidError('claim %s must be a String' % name)
 
   def _validate_timestamp_claim(self, name: Text):
-    if name in self._payload:
-      timestamp = self._payload[name]
-      if not isinstance(timestamp, (int, float)):
+    if name in self._registered:
+      timestamp = self._registered[name]
+      timestamp_type = type(timestamp)
+      if timestamp_type is not int and timestamp_type is not float:
         raise _jwt_error.JwtInvalidError('claim %s must be a Number' % name)
       if timestamp > _MAX_TIMESTAMP_VALUE or timestamp < 0:
         raise _jwt_error.JwtInvalidError(
             'timestamp of claim %s is out of range' % name)
 
   def _validate_audience_claim(self):
-    if 'aud' in self._payload:
-      audiences = self._payload['aud']
-      if isinstance(audiences, Text):
-        self._payload['aud'] = [audiences]
+    if 'aud' in self._registered:
+      audiences = self._registered['aud']
+      # A single audience may be encoded as a string. It is stored as it is,
+      # and audiences() wraps it into a list.
+      if type(audiences) is str:
         return
-      if not isinstance(audiences, list) or not audiences:
+      if type(audiences) is not list or not audiences:
         raise _jwt_error.JwtInvalidError('audiences must be a non-empty list')
-      if not all(isinstance(value, Text) for value in audiences):
-        raise _jwt_error.JwtInvalidError('audiences must only contain Text')
+      for value in audiences:
+        if type(value) is not str:
+          raise _jwt_error.JwtInvalidError('audiences must only contain Text')
+
+  # pylint: enable=unidiomatic-typecheck
 
   # TODO(juerg): Consider adding a raw_ prefix to all access methods
   def has_type_header(self) -> bool:
@@ -106,61 +189,68 @@ class RawJwt(object):
     return self._type_header
 
   def has_issuer(self) -> bool:
-    return 'iss' in self._payload
+    return 'iss' in self._registered
 
   def issuer(self) -> Text:
-    return cast(Text, self._payload['iss'])
+    return cast(Text, self._registered['iss'])
 
   def has_subject(self) -> bool:
-    return 'sub' in self._payload
+    return 'sub' in self._registered
 
   def subject(self) -> Text:
-    return cast(Text, self._payload['sub'])
+    return cast(Text, self._registered['sub'])
 
   def has_audiences(self) -> bool:
-    return 'aud' in self._payload
+    return 'aud' in self._registered
 
   def audiences(self) -> List[Text]:
-    return list(self._payload['aud'])
+    audiences = self._registered['aud']
+    if type(audiences) is str:  # pylint: disable=unidiomatic-typecheck
+      return [audiences]
+    return list(audiences)
 
   def has_jwt_id(self) -> bool:
-    return 'jti' in self._payload
+    return 'jti' in self._registered
 
   def jwt_id(self) -> Text:
-    return cast(Text, self._payload['jti'])
+    return cast(Text, self._registered['jti'])
 
   def has_expiration(self) -> bool:
-    return 'exp' in self._payload
+    return 'exp' in self._registered
 
   def expiration(self) -> datetime.datetime:
-    return _to_datetime(self._payload['exp'])
+    return _to_datetime(self._registered['exp'])
 
   def has_not_before(self) -> bool:
-    return 'nbf' in self._payload
+    return 'nbf' in self._registered
 
   def not_before(self) -> datetime.datetime:
-    return _to_datetime(self._payload['nbf'])
+    return _to_datetime(self._registered['nbf'])
 
   def has_issued_at(self) -> bool:
-    return 'iat' in self._payload
+    return 'iat' in self._registered
 
   def issued_at(self) -> datetime.datetime:
-    return _to_datetime(self._payload['iat'])
+    return _to_datetime(self._registered['iat'])
 
   def custom_claim_names(self) -> Set[Text]:
-    return {n for n in self._payload.keys() if n not in _REGISTERED_NAMES}
+    return set(self._custom)
 
   def custom_claim(self, name: Text) -> Claim:
     _validate_custom_claim_name(name)
-    value = self._payload[name]
-    if isinstance(value, (list, dict)):
-      return copy.deepcopy(value)
-    else:
-      return value
+    value = self._custom[name]
+    try:
+      return _copy_and_validate_claim(value)
+    except RecursionError:
+      raise _jwt_error.JwtInvalidError(
+          'claim %s is invalid, too many recursions' % name)
 
   def json_payload(self) -> Text:
     """Returns the payload encoded as JSON string."""
-    return _jwt_format.json_dumps(self._payload)
+    if self._json_payload is None:
+      self._json_payload = _jwt_format.json_dumps(
+          {**self._registered, **self._custom})
+    return self._json_payload
 
   @classmethod
   def create(cls,
@@ -168,7 +258,7 @@ class RawJwt(object):
              type_header: Optional[Text] = None,
              issuer: Optional[Text] = None,
              subject: Optional[Text] = None,
-             audiences: Optional[List[Text]] = None,
+             audiences: Optional[Union[Text, List[Text]]] = None,
              jwt_id: Optional[Text] = None,
              expiration: Optional[datetime.datetime] = None,
              without_expiration: Optional[bool] = None,
@@ -181,41 +271,41 @@ class RawJwt(object):
     if expiration and without_expiration:
       raise ValueError(
           'expiration and without_expiration cannot be set at the same time')
-    payload = {}
-    if issuer:
-      payload['iss'] = issuer
-    if subject:
-      payload['sub'] = subject
-    if jwt_id is not None:
-      payload['jti'] = jwt_id
-    if audiences is not None:
-      payload['aud'] = copy.copy(audiences)
-    if expiration:
-      payload['exp'] = _from_datetime(expiration)
-    if not_before:
-      payload['nbf'] = _from_datetime(not_before)
-    if issued_at:
-      payload['iat'] = _from_datetime(issued_at)
+    registered = {}
+    for name, value, convert in (('iss', issuer, _to_text),
+                                 ('sub', subject, _to_text),
+                                 ('jti', jwt_id, _to_text),
+                                 ('aud', audiences, _to_audiences),
+                                 ('exp', expiration, _from_datetime),
+                                 ('nbf', not_before, _from_datetime),
+                                 ('iat', issued_at, _from_datetime)):
+      if value is not None:
+        registered[name] = convert(value)
+    custom = {}
     if custom_claims:
       for name, value in custom_claims.items():
         _validate_custom_claim_name(name)
         if not isinstance(name, Text):
           raise _jwt_error.JwtInvalidError('claim name must be Text')
-        if (value is None or isinstance(value, (bool, int, float, Text))):
-          payload[name] = value
-        elif isinstance(value, list):
-          payload[name] = json.loads(json.dumps(value))
-        elif isinstance(value, dict):
-          payload[name] = json.loads(json.dumps(value))
-        else:
-          raise _jwt_error.JwtInvalidError('claim %s has unknown type' % name)
+        try:
+          custom[name] = _copy_and_validate_claim(value)
+        except _jwt_error.JwtInvalidError as e:
+          raise _jwt_error.JwtInvalidError(
+              'claim %s is invalid: %s' % (name, e))
+        except RecursionError:
+          raise _jwt_error.JwtInvalidError(
+              'claim %s is invalid, too many recursions' % name)
     raw_jwt = object.__new__(cls)
-    raw_jwt.__init__(type_header, payload)
+    raw_jwt.__init__(type_header, registered, custom, validate=False)
     return raw_jwt
 
   @classmethod
   def from_json(cls, type_header: Optional[Text], payload: Text) -> 'RawJwt':
     """Creates a RawJwt from payload encoded as JSON string."""
     raw_jwt = object.__new__(cls)
-    raw_jwt.__init__(type_header, _jwt_format.json_loads(payload))
+    registered, custom = _split_payload(_jwt_format.json_loads(payload))
+    raw_jwt.__init__(type_header, registered, custom)
+    # payload is not used as the cached JSON payload. It may contain duplicate
+    # names, of which only the last one is kept when decoding, so json_payload
+    # always encodes the claims that the token actually has.
     return raw_jwt
@@ -84,6 +84,13 @@ class RawJwtTest(absltest.TestCase):
     self.assertTrue(token.has_issuer())
     self.assertEqual(token.issuer(), 'Issuer')
 
+  def test_empty_string_claims(self):
+    token = jwt.new_raw_jwt(
+        issuer='', subject='', jwt_id='', without_expiration=True)
+    self.assertEqual(token.issuer(), '')
+    self.assertEqual(token.subject(), '')
+    self.assertEqual(token.jwt_id(), '')
+
   def test_subject(self):
     token = jwt.new_raw_jwt(subject='Subject', without_expiration=True)
     self.assertTrue(token.has_subject())
@@ -105,6 +112,41 @@ class RawJwtTest(absltest.TestCase):
     self.assertTrue(token.has_audiences())
     self.assertEqual(token.audiences(), ['bob'])
 
+  def test_str_subclass_claims(self):
+
+    class MyStr(str):
+      pass
+
+    token = jwt.new_raw_jwt(
+        issuer=MyStr('Issuer'),
+        audiences=[MyStr('bob')],
+        without_expiration=True)
+    self.assertEqual(token.issuer(), 'Issuer')
+    self.assertEqual(token.audiences(), ['bob'])
+    self.assertEqual(token.json_payload(), '{"iss":"Issuer","aud":["bob"]}')
+
+  def test_wrong_type_fails(self):
+    with self.assertRaises(jwt.JwtInvalidError):
+      jwt.new_raw_jwt(issuer=cast(Text, 123), without_expiration=True)
+    with self.assertRaises(jwt.JwtInvalidError):
+      jwt.new_raw_jwt(subject=cast(Text, 123), without_expiration=True)
+    with self.assertRaises(jwt.JwtInvalidError):
+      jwt.new_raw_jwt(jwt_id=cast(Text, 123), without_expiration=True)
+    with self.assertRaises(jwt.JwtInvalidError):
+      jwt.new_raw_jwt(
+          audiences=cast(List[Text], ['bob', 123]), without_expiration=True)
+
+  def test_audiences_with_wrong_type_fails(self):
+    for audiences in ({'bob': 1}, {'bob'}, ('bob',), (a for a in ['bob']), 1):
+      with self.assertRaises(jwt.JwtInvalidError):
+        jwt.new_raw_jwt(
+            audiences=cast(List[Text], audiences), without_expiration=True)
+
+  def test_single_string_audience(self):
+    token = jwt.new_raw_jwt(audiences='bob', without_expiration=True)
+    self.assertEqual(token.audiences(), ['bob'])
+    self.assertEqual(token.json_payload(), '{"aud":["bob"]}')
+
   def test_empty_audiences(self):
     with self.assertRaises(jwt.JwtInvalidError):
       jwt.new_raw_jwt(audiences=[], without_expiration=True)
@@ -114,6 +156,12 @@ class RawJwtTest(absltest.TestCase):
     self.assertTrue(token.has_expiration())
     self.assertEqual(token.expiration(), EXPIRATION)
 
+  def test_expiration_with_non_utc_timezone(self):
+    tz = datetime.timezone(datetime.timedelta(hours=2))
+    token = jwt.new_raw_jwt(expiration=EXPIRATION.astimezone(tz))
+    self.assertEqual(token.expiration(), EXPIRATION)
+    self.assertEqual(token.json_payload(), '{"exp":%d}' % EXPIRATION_TIMESTAMP)
+
   def test_round_down_expiration_with_fraction(self):
     token = jwt.new_raw_jwt(
         expiration=datetime.datetime.fromtimestamp(123.999,
@@ -186,6 +234,16 @@ class RawJwtTest(absltest.TestCase):
     with self.assertRaises(jwt.JwtInvalidError):
       jwt.new_raw_jwt(expiration=EXPIRATION.replace(tzinfo=None))
 
+  def test_rejects_tzinfo_without_utcoffset(self):
+
+    class NoOffset(datetime.tzinfo):
+
+      def utcoffset(self, dt):
+        return None
+
+    with self.assertRaises(jwt.JwtInvalidError):
+      jwt.new_raw_jwt(expiration=EXPIRATION.replace(tzinfo=NoOffset()))
+
   def test_custom_claims(self):
     custom_claims = {'string': 'value',
                      'boolean': True,
@@ -221,6 +279,53 @@ class RawJwtTest(absltest.TestCase):
     with self.assertRaises(jwt.JwtInvalidError):
       token.custom_claim('iss')
 
+  def test_custom_claim_with_invalid_type_fails(self):
+    with self.assertRaises(jwt.JwtInvalidError):
+      jwt.new_raw_jwt(
+          custom_claims={'tuple': (1, 2)}, without_expiration=True)
+    with self.assertRaises(jwt.JwtInvalidError):
+      jwt.new_raw_jwt(
+          custom_claims={'array': [1, object()]}, without_expiration=True)
+    with self.assertRaises(jwt.JwtInvalidError):
+      jwt.new_raw_jwt(
+          custom_claims={'object': {'a': {1: 'b'}}}, without_expiration=True)
+
+  def test_non_finite_custom_claim_fails(self):
+    for value in (float('nan'), float('inf'), [float('-inf')]):
+      with self.assertRaises(jwt.JwtInvalidError):
+        jwt.new_raw_jwt(custom_claims={'a': value}, without_expiration=True)
+
+  def test_large_integer_custom_claim(self):
+    token = jwt.new_raw_jwt(
+        custom_claims={'a': 2**64, 'b': [-2**63 - 1]},
+        without_expiration=True)
+    payload = token.json_payload()
+    self.assertEqual(payload, '{"a":18446744073709551616,'
+                     '"b":[-9223372036854775809]}')
+    parsed = jwt.RawJwt.from_json(None, payload)
+    self.assertEqual(parsed.custom_claim('a'), 2**64)
+    self.assertIsInstance(parsed.custom_claim('a'), int)
+    self.assertEqual(parsed.custom_claim('b'), [-2**63 - 1])
+
+  def test_deeply_nested_custom_claim(self):
+    claim = 'value'
+    for _ in range(300):
+      claim = {'a': claim}
+    token = jwt.new_raw_jwt(
+        custom_claims={'claim': claim}, without_expiration=True)
+    parsed = jwt.RawJwt.from_json(None, token.json_payload())
+    self.assertEqual(parsed.custom_claim('claim'), claim)
+
+  def test_deeply_nested_array_custom_claim(self):
+    claim = []
+    for _ in range(600):
+      claim = [claim]
+    token = jwt.new_raw_jwt(
+        custom_claims={'claim': claim}, without_expiration=True)
+    self.assertEqual(token.custom_claim('claim'), claim)
+    parsed = jwt.RawJwt.from_json(None, token.json_payload())
+    self.assertEqual(parsed.custom_claim('claim'), claim)
+
   def test_null_custom_claim(self):
     token = jwt.new_raw_jwt(
         custom_claims={'null_claim': None}, without_expiration=True)
@@ -286,6 +391,12 @@ class RawJwtTest(absltest.TestCase):
     token = jwt.new_raw_jwt(expiration=expiration)
     self.assertEqual(token.json_payload(), '{"exp":2218027244}')
 
+  def test_json_payload_called_twice(self):
+    token = jwt.new_raw_jwt(issuer='Issuer', expiration=EXPIRATION)
+    self.assertEqual(token.json_payload(), token.json_payload())
+    self.assertEqual(token.json_payload(),
+                     '{"iss":"Issuer","exp":%d}' % EXPIRATION_TIMESTAMP)
+
   def test_float_exp_to_payload(self):
     expiration = datetime.datetime.fromtimestamp(123.999, datetime.timezone.utc)
     token = jwt.new_raw_jwt(expiration=expiration)
@@ -297,11 +408,8 @@ class RawJwtTest(absltest.TestCase):
         'aud': 'bob',
     }
     token = jwt.RawJwt.from_json(None, json.dumps(payload))
-    expected = {
-        'iss': 'Issuer',
-        'aud': ['bob'],
-    }
-    self.assertEqual(json.loads(token.json_payload()), expected)
+    self.assertEqual(token.audiences(), ['bob'])
+    self.assertEqual(json.loads(token.json_payload()), payload)
 
   def test_from_payload_with_wrong_issuer_fails(self):
     with self.assertRaises(jwt.JwtInvalidError):
@@ -327,6 +435,18 @@ class RawJwtTest(absltest.TestCase):
     with self.assertRaises(jwt.JwtInvalidError):
       jwt.RawJwt.from_json(None, '{"nbf":"123"}')
 
+  def test_from_payload_with_boolean_timestamp_fails(self):
+    with self.assertRaises(jwt.JwtInvalidError):
+      jwt.RawJwt.from_json(None, '{"exp":true}')
+    with self.assertRaises(jwt.JwtInvalidError):
+      jwt.RawJwt.from_json(None, '{"iat":false}')
+
+  def test_from_payload_with_wrong_audience_fails(self):
+    with self.assertRaises(jwt.JwtInvalidError):
+      jwt.RawJwt.from_json(None, '{"aud":["bob",123]}')
+    with self.assertRaises(jwt.JwtInvalidError):
+      jwt.RawJwt.from_json(None, '{"aud":[]}')
+
   def test_from_payload_with_exp_expiration_success(self):
     token = jwt.RawJwt.from_json(None, '{"exp":1e10}')
     self.assertEqual(
@@ -12,3 +12,9 @@ def tink_py_deps_init(workspace_name):
         name = "tink_py_pip_deps",
         requirements = "@" + workspace_name + "//:requirements.txt",
     )
+
+    # Optional dependencies that are only needed to run the tests.
+    pip3_import(
+        name = "tink_py_test_pip_deps",
+        requirements = "@" + workspace_name + "//:requirements_test.txt",
+    )